@@ -3,6 +3,9 @@ import memcached_benchmarking as mb
 from matplotlib import pyplot as plt
 import time
 import config
+import contextlib
+import io
+import threading
 
 def set_maxmemory(r, m, limit):
     rb.set_maxmemory(r, str(limit)+'mb')
@@ -43,7 +46,106 @@ def API_test(n, path, params):
 
 
 
+
+'''
+run_phases_concurrently():
+run the phases over the already opened connections, one thread per connection.
+all threads start each phase together (barrier) and the wall time of a phase is the time the slowest thread took,
+process_time is not used here because it adds up the CPU time of every thread
+returns {phase name: operations per second across all threads}
+'''
+def run_phases_concurrently(phases, connections, n, ratio):
+    barrier = threading.Barrier(len(connections))
+    elapsed = {name: [] for name, phase in phases}
+    lock = threading.Lock()
+    errors = []
+
+    def worker(conn):
+        try:
+            for name, phase in phases:
+                barrier.wait()
+                start = time.perf_counter()
+                phase(conn, n, ratio)
+                end = time.perf_counter()
+                with lock:
+                    elapsed[name].append(end - start)
+        except Exception as e:
+            with lock:
+                errors.append(e)
+            barrier.abort() # release the other threads instead of leaving them waiting on the barrier
+
+    threads = [threading.Thread(target = worker, args = (conn,)) for conn in connections]
+    # the phase functions print their own per thread averages, keep the output to the summary table
+    with contextlib.redirect_stdout(io.StringIO()):
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    if errors:
+        # the other threads stop with BrokenBarrierError once the barrier is aborted, raise the error that caused it
+        raise next((e for e in errors if not isinstance(e, threading.BrokenBarrierError)), errors[0])
+    return {name: n*len(connections)/max(elapsed[name]) for name, phase in phases}
+
+
+'''
+transport_test():
+compare TCP loopback against Unix domain sockets for the test_time / time_test phases at several concurrency levels
+redis_socket and memcached_socket are the Unix socket paths of the servers (unixsocket in redis.conf, memcached -s)
+memcached cannot listen on TCP and a Unix socket at the same time, so memcached_port should be a second instance started without -s
+TCP connections set TCP_NODELAY for both backends (redis-py always does, memcached opts in here)
+every concurrency level opens its connections first (which flushes the cache) and then runs the phases, no keys are deleted between phases
+'''
+def transport_test(n, ratio, redis_socket, memcached_socket, concurrency_levels = (1, 4, 16), redis_port = 6379, memcached_port = 11211):
+    transports = [
+        ('Redis TCP', rb.TEST_TIME_PHASES, lambda: rb.create_server(port_number_ = redis_port)),
+        ('Redis UDS', rb.TEST_TIME_PHASES, lambda: rb.create_server(unix_socket_path_ = redis_socket)),
+        ('memcached TCP', mb.TIME_TEST_PHASES, lambda: mb.memcached_connection(portnum = memcached_port, tcp_nodelay_ = True)),
+        ('memcached UDS', mb.TIME_TEST_PHASES, lambda: mb.memcached_connection(unix_socket_path_ = memcached_socket)),
+    ]
+    results = {}
+    for label, phases, connect in transports:
+        for c in concurrency_levels:
+            with contextlib.redirect_stdout(io.StringIO()):
+                connections = [connect() for x in range(c)]
+            results[(label, c)] = run_phases_concurrently(phases, connections, n, ratio)
+
+    phase_names = [name for name, phase in rb.TEST_TIME_PHASES]
+    print("\nOperations per second, {} operations per thread".format(n))
+    print("{:<16}{:>8}".format("transport", "threads") + "".join("{:>16}".format(name) for name in phase_names))
+    for (label, c), ops in results.items():
+        print("{:<16}{:>8}".format(label, c) + "".join("{:>16.0f}".format(ops[name]) for name in phase_names))
+    return results
+
+
+
+
+'''
+data_structure_test():
+run the Redis data structure benchmarks over the collection sizes and plot the average latency of every command against the size
+(log-log axes, so a flat line is O(1) and a line of slope 1 is O(size))
+'''
+def data_structure_test(sizes = (1000, 10000, 100000, 1000000), n = 1000, output_path = 'data_structure_latency.png'):
+    results = rb.time_data_structures(sizes, n)
+    for (structure, command), points in results.items():
+        plt.plot([size for size, average in points], [average*1e6 for size, average in points], marker = 'o', label = command)
+    plt.xscale('log')
+    plt.yscale('log')
+    plt.xlabel('collection size')
+    plt.ylabel('average latency (microseconds)')
+    plt.title('Redis command latency against collection size')
+    plt.legend()
+    plt.savefig(output_path)
+    plt.close()
+    return results
+
+
+
 #API_test(100, config.coin_desk_path, config.coin_desk_params)
-operations_test(10000, 1/2)
+#transport_test(10000, 1/2, '/tmp/redis.sock', '/tmp/memcached.sock', memcached_port = 11211)
+#data_structure_test()
 
 
+# run with python benchmark.py, importing this module no longer starts a benchmark
+# parameter sweeps are run with scenario_runner.py
+if __name__ == '__main__':
+    operations_test(10000, 1/2)
@@ -1,15 +1,48 @@
-from pymemcache.client.base import Client
+from pymemcache.client.base import Client, KeepaliveOpts
+import socket
 import time
 import numpy as np
 import requests
 import json
 import config
+'''
+BufferedSocketModule:
+stands in for the socket module passed to the pymemcache Client (socket_module argument),
+every socket it creates gets the SO_SNDBUF / SO_RCVBUF sizes before pymemcache connects it, since the TCP receive window scaling is fixed at the handshake
+(pymemcache already handles TCP_NODELAY and keepalive itself)
+'''
+class BufferedSocketModule:
+    def __init__(self, send_buffer = None, recv_buffer = None):
+        self.send_buffer = send_buffer
+        self.recv_buffer = recv_buffer
+
+    def __getattr__(self, name):
+        return getattr(socket, name)
+
+    def socket(self, *args, **kwargs):
+        sock = socket.socket(*args, **kwargs)
+        if self.send_buffer is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.send_buffer)
+        if self.recv_buffer is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.recv_buffer)
+        return sock
+
+
 '''
 memcached_connection():
 Establish connnection with Memcached server with some provided arguments
 '''
-def memcached_connection(hostname = 'localhost', portnum = 11211, connect_timeout_ = None, timeout_ = None):
-    mem = Client((hostname, portnum), connect_timeout = connect_timeout_, timeout = timeout_)
+def memcached_connection(hostname = 'localhost', portnum = 11211, connect_timeout_ = None, timeout_ = None, unix_socket_path_ = None, tcp_nodelay_ = False, socket_keepalive_ = False, keepalive_options_ = None, send_buffer_ = None, recv_buffer_ = None):
+    # unix_socket_path_: path of the memcached Unix domain socket (memcached -s), if set hostname and portnum are ignored
+    # tcp_nodelay_: set TCP_NODELAY on TCP sockets, False by default (same as pymemcache)
+    # socket_keepalive_: enable SO_KEEPALIVE on TCP sockets, keepalive_options_ is an optional (idle, interval, count) tuple
+    # send_buffer_, recv_buffer_: SO_SNDBUF / SO_RCVBUF sizes in bytes, kernel default if None
+    # pymemcache only treats strings starting with / or unix: as socket paths, the prefix keeps relative paths from being read as a hostname
+    server = (hostname, portnum) if unix_socket_path_ is None else 'unix:' + unix_socket_path_
+    keepalive = None
+    if socket_keepalive_ and unix_socket_path_ is None:
+        keepalive = KeepaliveOpts(*keepalive_options_) if keepalive_options_ is not None else KeepaliveOpts()
+    mem = Client(server, socket_module = BufferedSocketModule(send_buffer_, recv_buffer_), connect_timeout = connect_timeout_, timeout = timeout_, no_delay = tcp_nodelay_, socket_keepalive = keepalive)
     # the server(hostname) parameter can be passed a host string, a host:port string, or a (host, port) 2-tuple. 
     # The host part may be a domain name, an IPv4 address, or an IPv6 address. 
     # The port may be omitted, in which case it will default to 11211.
@@ -142,15 +175,25 @@ def time_mem_incr(mem, n, amt = 1):
 
 
 
-def time_test(n, ratio):
-    mem = memcached_connection()
+'''
+time_test():
+run the string benchmark phases in order, TIME_TEST_PHASES lists them as (name, function(mem, n, ratio)) so other benchmarks can run them on their own connections
+'''
+TIME_TEST_PHASES = [
+    ('SET', lambda mem, n, ratio: time_set(mem, n)),
+    ('GET hit', lambda mem, n, ratio: time_get(mem, n)),
+    ('GET miss', lambda mem, n, ratio: time_miss(mem, n)),
+    ('GET half miss', lambda mem, n, ratio: time_half_miss(mem, n)),
+    ('GET ratio miss', lambda mem, n, ratio: time_ratio_miss(mem, ratio, n)),
+    ('INCR', lambda mem, n, ratio: time_mem_incr(mem, n)),
+]
+
+def time_test(n, ratio, **connection_args):
+    #connection_args are passed to memcached_connection, e.g. unix_socket_path_ = '/tmp/memcached.sock'
+    mem = memcached_connection(**connection_args)
     mem.flush_all()
-    time_set(mem, n)
-    time_get(mem, n)
-    time_miss(mem, n)
-    time_half_miss(mem, n)
-    time_ratio_miss(mem, ratio, n)
-    time_mem_incr(mem, n)
+    for name, phase in TIME_TEST_PHASES:
+        phase(mem, n, ratio)
 
 
 
@@ -1,20 +1,89 @@
 import redis
+import socket
 import time
 import json
 import requests
 import numpy as np
 from datetime import timedelta
 import config
+'''socket_options():
+builds the list of (level, option, value) socket options applied to every new connection
+tcp_nodelay only applies to TCP sockets, the buffer sizes apply to both TCP and Unix domain sockets
+'''
+def socket_options(tcp_nodelay = True, send_buffer = None, recv_buffer = None, unix_socket = False):
+    options = []
+    if not unix_socket:
+        options.append((socket.IPPROTO_TCP, socket.TCP_NODELAY, 1 if tcp_nodelay else 0))
+    if send_buffer is not None:
+        options.append((socket.SOL_SOCKET, socket.SO_SNDBUF, send_buffer))
+    if recv_buffer is not None:
+        options.append((socket.SOL_SOCKET, socket.SO_RCVBUF, recv_buffer))
+    return options
+
+
+'''tuned_connection_class():
+subclass the redis-py connection class so the given socket options are set on each socket the pool opens
+the options are set before connect(), like redis-py does for TCP_NODELAY, since the TCP receive window scaling is fixed at the handshake
+'''
+def tuned_connection_class(base_class, options):
+    class TunedConnection(base_class):
+        def _connect(self):
+            if isinstance(self, redis.UnixDomainSocketConnection):
+                return self._connect_socket(socket.AF_UNIX, socket.SOCK_STREAM, 0, self.path)
+            # same address resolution as redis.Connection._connect, trying every address returned
+            err = None
+            for family, socktype, proto, canonname, socket_address in socket.getaddrinfo(self.host, self.port, self.socket_type, socket.SOCK_STREAM):
+                try:
+                    return self._connect_socket(family, socktype, proto, socket_address)
+                except OSError as e:
+                    err = e
+            if err is not None:
+                raise err
+            raise OSError("socket.getaddrinfo returned an empty list")
+
+        def _connect_socket(self, family, socktype, proto, address):
+            sock = socket.socket(family, socktype, proto)
+            try:
+                for level, option, value in options:
+                    sock.setsockopt(level, option, value)
+                if family != socket.AF_UNIX and self.socket_keepalive:
+                    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+                    for k, v in self.socket_keepalive_options.items():
+                        sock.setsockopt(socket.IPPROTO_TCP, k, v)
+                sock.settimeout(self.socket_connect_timeout)
+                sock.connect(address)
+                sock.settimeout(self.socket_timeout)
+                return sock
+            except OSError:
+                sock.close()
+                raise
+    return TunedConnection
+
+
 '''setup_connection:
 sets up the redis server and initiates the connection
 '''
-def setup_connection(hostname = 'localhost', port_number = 6379, db_num = 0, pass_word = None, socket_timeout_ = None):
+def setup_connection(hostname = 'localhost', port_number = 6379, db_num = 0, pass_word = None, socket_timeout_ = None, unix_socket_path_ = None, tcp_nodelay_ = True, socket_keepalive_ = False, keepalive_options_ = None, send_buffer_ = None, recv_buffer_ = None):
     #hostname = IP of host, local by default
     #port_number: TCP port number , 6379 by default
     #db_num: database number, can run upto 16
     #pass_word: password, default set to None
     #socket_timeout_ : connection timeout
-    r = redis.Redis(host = hostname, port = port_number, db = db_num, password = pass_word, socket_timeout = socket_timeout_)
+    #unix_socket_path_: path of the Redis Unix domain socket, if set hostname and port_number are ignored
+    #tcp_nodelay_: set TCP_NODELAY on TCP sockets, True by default (same as redis-py)
+    #socket_keepalive_: enable SO_KEEPALIVE on TCP sockets
+    #keepalive_options_: optional (idle, interval, count) tuple in seconds/probes used with socket_keepalive_
+    #send_buffer_, recv_buffer_: SO_SNDBUF / SO_RCVBUF sizes in bytes, kernel default if None
+    options = socket_options(tcp_nodelay_, send_buffer_, recv_buffer_, unix_socket = unix_socket_path_ is not None)
+    if unix_socket_path_ is not None:
+        pool = redis.ConnectionPool(connection_class = tuned_connection_class(redis.UnixDomainSocketConnection, options), path = unix_socket_path_, db = db_num, password = pass_word, socket_timeout = socket_timeout_)
+    else:
+        keepalive = None
+        if keepalive_options_ is not None:
+            idle, interval, count = keepalive_options_
+            keepalive = {socket.TCP_KEEPIDLE: idle, socket.TCP_KEEPINTVL: interval, socket.TCP_KEEPCNT: count}
+        pool = redis.ConnectionPool(connection_class = tuned_connection_class(redis.Connection, options), host = hostname, port = port_number, db = db_num, password = pass_word, socket_timeout = socket_timeout_, socket_keepalive = socket_keepalive_, socket_keepalive_options = keepalive)
+    r = redis.Redis(connection_pool = pool)
     r.flushall()
     return r if r.ping() == True else None
 
@@ -93,10 +162,11 @@ def set_maxmemory_samples(r_conn, sample_num):
 '''
 create_server():
 master function/wrapper to create the connection and server and set the desired memory limits and eviction policies and the sample 
+pass unix_socket_path_ to connect over a Unix domain socket instead of TCP, the socket tuning arguments are passed through to setup_connection
 '''
 
-def create_server(hostname_ = 'localhost', port_number_ = 6379, db_num_ = 0, pass_word_= None, _socket_timeout_ = None, memory_arg_ = 0, eviction_policy_ = 'allkeys-lru', sample_num_ = 10):
-    r = setup_connection(hostname = hostname_, port_number= port_number_, db_num = db_num_, pass_word=pass_word_, socket_timeout_= _socket_timeout_)
+def create_server(hostname_ = 'localhost', port_number_ = 6379, db_num_ = 0, pass_word_= None, _socket_timeout_ = None, memory_arg_ = 0, eviction_policy_ = 'allkeys-lru', sample_num_ = 10, unix_socket_path_ = None, tcp_nodelay_ = True, socket_keepalive_ = False, keepalive_options_ = None, send_buffer_ = None, recv_buffer_ = None):
+    r = setup_connection(hostname = hostname_, port_number= port_number_, db_num = db_num_, pass_word=pass_word_, socket_timeout_= _socket_timeout_, unix_socket_path_ = unix_socket_path_, tcp_nodelay_ = tcp_nodelay_, socket_keepalive_ = socket_keepalive_, keepalive_options_ = keepalive_options_, send_buffer_ = send_buffer_, recv_buffer_ = recv_buffer_)
     if r is None:
         raise Exception("Redis Server Connection Not Established")
     else:
@@ -272,16 +342,23 @@ def test_expiry_string():
 '''
 test_time
 wrapper function to call the functions that measure the time taken for various scearios of reddis string key, value pairs
-'''
-def test_time(n, ratio):
-    r = create_server()
+TEST_TIME_PHASES lists the phases in order as (name, function(r, n, ratio)) so other benchmarks can run them on their own connections
+'''
+TEST_TIME_PHASES = [
+    ('SET', lambda r, n, ratio: time_set_str(r, n)),
+    ('GET hit', lambda r, n, ratio: time_get_str(r, n)),
+    ('GET miss', lambda r, n, ratio: time_str_miss(r, n)),
+    ('GET half miss', lambda r, n, ratio: time_half_miss(r, n)),
+    ('GET ratio miss', lambda r, n, ratio: time_ratio_miss(r, ratio, n)),
+    ('INCR', lambda r, n, ratio: time_incr(r, n)),
+]
+
+def test_time(n, ratio, **server_args):
+    #server_args are passed to create_server, e.g. unix_socket_path_ = '/tmp/redis.sock'
+    r = create_server(**server_args)
     r.flushall() #clear keys
-    time_set_str(r, n)
-    time_get_str(r, n)
-    time_str_miss(r, n)
-    time_half_miss(r, n)
-    time_ratio_miss(r, ratio, n)
-    time_incr(r, n)
+    for name, phase in TEST_TIME_PHASES:
+        phase(r, n, ratio)
 
 
 
@@ -401,6 +478,169 @@ def time_list_numerical_sorting(n):
     return sorting_time
 
 
+
+#data structure benchmarks
+
+'''
+The functions below measure the latency of sorted set, hash, list, stream and HyperLogLog commands against the size of the collection.
+Each one bulk loads a collection of size elements with a non transactional pipeline (batch commands per round trip),
+then times n single commands against it and returns {command: average latency in seconds}.
+The latency is wall clock time (time.perf_counter), since process_time only counts the client CPU and not the time spent waiting on Redis.
+Commands that read the whole collection (HGETALL) are timed scan_n times instead of n times, as they are O(size).
+'''
+
+'''
+pipeline_load():
+calls add(pipe, i) for i in range(size) on a non transactional pipeline, sending batch commands per round trip
+'''
+def pipeline_load(r_conn, size, add, batch = 10000):
+    pipe = r_conn.pipeline(transaction = False)
+    for i in range(size):
+        add(pipe, i)
+        if (i+1) % batch == 0:
+            pipe.execute()
+    pipe.execute()
+
+
+'''
+time_op():
+average wall clock time of n calls of op(i), where i is the number of the call
+'''
+def time_op(n, op):
+    sum = 0
+    for i in range(n):
+        start = time.perf_counter()
+        op(i)
+        end = time.perf_counter()
+        sum += (end - start)
+    return sum/n
+
+
+'''
+time_sorted_set():
+leaderboard style sorted set, member i has score i
+ZRANGEBYSCORE reads a window of 10 scores, ZRANK ranks a random member, ZADD moves a random member to a new score
+(Redis skips the skiplist update when ZADD writes the score a member already has, so the new score always differs, and ZADD runs last so the reads see the loaded scores)
+'''
+def time_sorted_set(r_conn, size, n, batch = 10000):
+    key = 'bench-zset'
+    r_conn.delete(key)
+    pipeline_load(r_conn, size, lambda pipe, i: pipe.zadd(key, {i: i}), batch)
+    members = np.random.randint(0, size, n)
+    return {
+        'ZRANGEBYSCORE': time_op(n, lambda i: r_conn.zrangebyscore(key, int(members[i]), int(members[i]) + 9)),
+        'ZRANK': time_op(n, lambda i: r_conn.zrank(key, int(members[i]))),
+        'ZADD': time_op(n, lambda i: r_conn.zadd(key, {int(members[i]): int(members[i]) + size + i})),
+    }
+
+
+'''
+time_hash():
+session style hash with size fields
+HSET updates a random field, HGETALL reads the whole hash
+'''
+def time_hash(r_conn, size, n, scan_n = 10, batch = 10000):
+    key = 'bench-hash'
+    r_conn.delete(key)
+    pipeline_load(r_conn, size, lambda pipe, i: pipe.hset(key, i, i), batch)
+    fields = np.random.randint(0, size, n)
+    return {
+        'HSET': time_op(n, lambda i: r_conn.hset(key, int(fields[i]), i)),
+        'HGETALL': time_op(scan_n, lambda i: r_conn.hgetall(key)),
+    }
+
+
+'''
+time_list_push_pop():
+queue style list, n LPUSH followed by n BRPOP so the list is back to size elements at the end
+'''
+def time_list_push_pop(r_conn, size, n, batch = 10000):
+    key = 'bench-list'
+    r_conn.delete(key)
+    pipeline_load(r_conn, size, lambda pipe, i: pipe.lpush(key, i), batch)
+    return {
+        'LPUSH': time_op(n, lambda i: r_conn.lpush(key, i)),
+        'BRPOP': time_op(n, lambda i: r_conn.brpop(key, timeout = 1)),
+    }
+
+
+'''
+time_stream():
+queue style stream read by a consumer group
+n XADD calls, then n XREADGROUP calls each reading one new entry, the group is created at the start of the stream
+'''
+def time_stream(r_conn, size, n, batch = 10000):
+    key = 'bench-stream'
+    r_conn.delete(key)
+    pipeline_load(r_conn, size, lambda pipe, i: pipe.xadd(key, {'v': i}), batch)
+    r_conn.xgroup_create(key, 'bench-group', id = '0', mkstream = True)
+    return {
+        'XADD': time_op(n, lambda i: r_conn.xadd(key, {'v': i})),
+        'XREADGROUP': time_op(n, lambda i: r_conn.xreadgroup('bench-group', 'bench-consumer', {key: '>'}, count = 1)),
+    }
+
+
+'''
+time_hyperloglog():
+HyperLogLog loaded with size distinct elements, PFADD adds a new element and PFCOUNT estimates the cardinality
+PFADD takes many elements at once, so the bulk load sends batch elements per PFADD call instead of pipelining
+PFCOUNT returns a cached cardinality until a PFADD changes a register, so PFADD and PFCOUNT are interleaved and PFCOUNT is only timed after a PFADD that returned 1.
+The bigger the HLL, the fewer new elements change a register, so at most 100*n PFADD calls are made and PFCOUNT is left out if none changed it.
+A HyperLogLog is a fixed ~12 KB whatever the number of elements, so both lines are expected to stay flat over the size sweep.
+'''
+def time_hyperloglog(r_conn, size, n, batch = 10000):
+    key = 'bench-hll'
+    r_conn.delete(key)
+    for start in range(0, size, batch):
+        r_conn.pfadd(key, *range(start, min(start + batch, size)))
+    add_sum = 0
+    adds = 0
+    count_sum = 0
+    counts = 0
+    while counts < n and adds < 100*n:
+        start = time.perf_counter()
+        changed = r_conn.pfadd(key, size + adds)
+        end = time.perf_counter()
+        add_sum += (end - start)
+        adds += 1
+        if changed:
+            start = time.perf_counter()
+            r_conn.pfcount(key)
+            end = time.perf_counter()
+            count_sum += (end - start)
+            counts += 1
+    result = {'PFADD': add_sum/adds}
+    if counts > 0:
+        result['PFCOUNT'] = count_sum/counts
+    return result
+
+
+DATA_STRUCTURE_BENCHMARKS = [
+    ('sorted set', time_sorted_set),
+    ('hash', time_hash),
+    ('list', time_list_push_pop),
+    ('stream', time_stream),
+    ('hyperloglog', time_hyperloglog),
+]
+
+'''
+time_data_structures():
+runs every data structure benchmark for each collection size in sizes, n timed commands each
+prints a table and returns {(structure, command): [(size, average latency in seconds), ...]}
+'''
+def time_data_structures(sizes = (1000, 10000, 100000, 1000000), n = 1000, **server_args):
+    r = create_server(**server_args)
+    r.flushall()
+    results = {}
+    for size in sizes:
+        for structure, benchmark in DATA_STRUCTURE_BENCHMARKS:
+            for command, average in benchmark(r, size, n).items():
+                results.setdefault((structure, command), []).append((size, average))
+                print("{:<12}{:<14} size {:>9}: average latency {:.2f} microseconds".format(structure, command, size, average*1e6))
+        r.flushall()
+    return results
+
+
 #basic transactions with MULTI and EXEC
 
 '''
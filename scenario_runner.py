@@ -0,0 +1,474 @@
+import argparse
+import concurrent.futures
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+# numpy and the redis / memcached benchmark modules are imported by the worker functions that use them,
+# so the spec and resume logic run without the client libraries installed
+
+'''
+scenario_runner:
+reads a scenario spec (TOML, JSON or YAML) and expands its matrix into a sweep of benchmark cells,
+one cell per combination of backend, op mix, key distribution, value size, batch and concurrency.
+Every cell runs in its own worker process against its own redis-server / memcached instance listening on a private Unix socket,
+so independent cells can run in parallel without sharing a cache.
+Results are appended to a JSON lines file as cells finish, and cells already in that file are skipped, so an interrupted sweep can be resumed.
+
+usage: python scenario_runner.py scenarios/string_mix.toml [--output results.jsonl] [--workers 4]
+
+spec format (TOML shown, the JSON / YAML layout is the same):
+    name = "string mix"
+    operations = 100000        # operations per cell, split between the concurrent clients
+    keyspace = 100000          # keys 0..keyspace-1 are loaded before the cell is timed
+    workers = 4                # cells run at the same time, default half the CPUs (each cell also runs a server and its client threads)
+    [matrix]                   # every axis takes a list, missing axes use DEFAULTS
+    backend = ["redis", "memcached"]
+    op_mix = [{get = 0.9, set = 0.1}, {get = 0.5, set = 0.5}]
+    key_distribution = ["uniform", "zipf"]
+    value_size = [16, 1024]
+    batch = [1, 16]
+    concurrency = [1, 8]
+    [servers]                  # optional
+    redis = "redis-server"
+    memcached = "memcached"
+also optional at the top level: memcached_memory_mb (default 1024), memcached_user (memcached -u, needed when running as root), zipf_exponent (default 1.2)
+'''
+
+AXES = ['backend', 'op_mix', 'key_distribution', 'value_size', 'batch', 'concurrency']
+
+DEFAULTS = {
+    'backend': ['redis', 'memcached'],
+    'op_mix': [{'get': 0.9, 'set': 0.1}],
+    'key_distribution': ['uniform'],
+    'value_size': [100],
+    'batch': [1],
+    'concurrency': [1],
+}
+
+OPERATIONS = ('get', 'set')
+
+SERVERS = {'redis': 'redis-server', 'memcached': 'memcached'}
+
+
+'''
+load_spec():
+read the scenario spec, the format is picked from the file extension
+TOML uses tomllib (or tomli before python 3.11) and YAML needs PyYAML
+'''
+def load_spec(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.json':
+        with open(path) as f:
+            return json.load(f)
+    if extension == '.toml':
+        try:
+            import tomllib
+        except ImportError:
+            import tomli as tomllib
+        with open(path, 'rb') as f:
+            return tomllib.load(f)
+    if extension in ('.yaml', '.yml'):
+        try:
+            import yaml
+        except ImportError:
+            raise Exception("PyYAML is needed to read YAML scenario specs")
+        with open(path) as f:
+            return yaml.safe_load(f)
+    raise Exception("Unsupported scenario spec format: {}".format(extension))
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def is_positive_int(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+
+'''
+expand_cells():
+expand the matrix of the spec into the list of cells (dicts), checking the values of every axis
+so an invalid spec fails here, before any server is started
+'''
+def expand_cells(spec):
+    matrix = spec.get('matrix', {})
+    unknown = set(matrix) - set(AXES)
+    if unknown:
+        raise Exception("Unknown matrix axes: {}".format(sorted(unknown)))
+    axes = []
+    for axis in AXES:
+        values = matrix.get(axis, DEFAULTS[axis])
+        axes.append(values if isinstance(values, list) else [values])
+
+    cells = []
+    for values in itertools.product(*axes):
+        cell = dict(zip(AXES, values))
+        if cell['backend'] not in SERVERS:
+            raise Exception("Unknown backend: {}".format(cell['backend']))
+        op_mix = cell['op_mix']
+        if not isinstance(op_mix, dict) or not set(op_mix) <= set(OPERATIONS) or not all(is_number(weight) and weight >= 0 for weight in op_mix.values()) or sum(op_mix.values()) <= 0:
+            raise Exception("op_mix must give non negative weights, not all zero, to {}: {}".format(OPERATIONS, op_mix))
+        if cell['key_distribution'] not in ('uniform', 'zipf'):
+            raise Exception("Unknown key distribution: {}".format(cell['key_distribution']))
+        cell['operations'] = spec.get('operations', 10000)
+        cell['keyspace'] = spec.get('keyspace', 10000)
+        cell['zipf_exponent'] = spec.get('zipf_exponent', 1.2)
+        for name in ('value_size', 'batch', 'concurrency', 'operations', 'keyspace'):
+            if not is_positive_int(cell[name]):
+                raise Exception("{} must be a positive integer: {!r}".format(name, cell[name]))
+        if cell['operations'] < cell['concurrency']:
+            raise Exception("operations ({}) must be at least the concurrency ({}) so every client runs an operation".format(cell['operations'], cell['concurrency']))
+        if cell['key_distribution'] == 'zipf' and (not is_number(cell['zipf_exponent']) or cell['zipf_exponent'] <= 1):
+            raise Exception("zipf_exponent must be greater than 1: {}".format(cell['zipf_exponent']))
+        cells.append(cell)
+    return cells
+
+
+'''
+cell_id():
+stable id of a cell, used to find the cells already completed when a sweep is resumed
+'''
+def cell_id(cell):
+    return hashlib.sha1(json.dumps(cell, sort_keys = True).encode('utf-8')).hexdigest()[:16]
+
+
+'''
+completed_cells():
+ids of the cells that already have a successful result in the output file
+'''
+def completed_cells(output_path):
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue # partially written line from an interrupted run
+            if 'error' not in result:
+                done.add(result['id'])
+    return done
+
+
+'''
+server_ready():
+True once the server answers on the Unix socket (PING for Redis, version for memcached)
+a raw socket is used so the check does not flush the cache like the connection helpers do
+'''
+def server_ready(backend, path):
+    request, reply = (b'PING\r\n', b'+PONG') if backend == 'redis' else (b'version\r\n', b'VERSION')
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(1)
+    try:
+        sock.connect(path)
+        sock.sendall(request)
+        return sock.recv(64).startswith(reply)
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+'''
+start_server():
+start a private redis-server or memcached listening only on a Unix socket in directory,
+returns the process and the socket path once the server answers on the socket
+the server output goes to <backend>.log in directory, and its end is put in the exception if the server does not come up
+memcached refuses to run as root unless memcached_user is given (-u)
+'''
+def start_server(backend, directory, servers, memcached_memory_mb = 1024, memcached_user = None):
+    path = os.path.join(directory, backend + '.sock')
+    if backend == 'redis':
+        command = [servers['redis'], '--port', '0', '--unixsocket', path, '--save', '', '--appendonly', 'no', '--dir', directory]
+    else:
+        command = [servers['memcached'], '-s', path, '-m', str(memcached_memory_mb)]
+        if memcached_user is not None:
+            command += ['-u', memcached_user]
+    log_path = os.path.join(directory, backend + '.log')
+    with open(log_path, 'w') as log:
+        process = subprocess.Popen(command, stdout = log, stderr = subprocess.STDOUT)
+    deadline = time.time() + 10
+    while not server_ready(backend, path):
+        if process.poll() is not None or time.time() > deadline:
+            process.kill()
+            process.wait()
+            with open(log_path) as log:
+                output = log.read()[-2000:].strip()
+            raise Exception("Could not start {} (exit code {}): {}".format(' '.join(command), process.returncode, output or 'no output'))
+        time.sleep(0.05)
+    return process, path
+
+
+'''
+connect():
+open a client for the backend over the Unix socket, the connection helpers flush the cache so this is only used before the cell is timed
+'''
+def connect(backend, path):
+    if backend == 'redis':
+        import redis_benchmarking as rb
+        r = rb.setup_connection(unix_socket_path_ = path)
+        if r is None:
+            raise Exception("Redis Server Connection Not Established")
+        return r
+    import memcached_benchmarking as mb
+    return mb.memcached_connection(unix_socket_path_ = path)
+
+
+'''
+load_keyspace():
+set keys 0..keyspace-1 to value, pipelined for Redis and with set_many for memcached
+pymemcache sends writes with noreply by default, so memcached writes here and in execute_batch wait for the reply like Redis does
+'''
+def load_keyspace(backend, client, keyspace, value, batch = 1000):
+    for start in range(0, keyspace, batch):
+        keys = [str(x) for x in range(start, min(start + batch, keyspace))]
+        if backend == 'redis':
+            pipe = client.pipeline(transaction = False)
+            for key in keys:
+                pipe.set(key, value)
+            pipe.execute()
+        else:
+            client.set_many({key: value for key in keys}, noreply = False)
+
+
+'''
+draw_keys():
+count keys drawn from the key distribution of the cell, zipf keys are folded into the keyspace
+'''
+def draw_keys(rng, cell, count):
+    if cell['key_distribution'] == 'zipf':
+        return (rng.zipf(cell['zipf_exponent'], count) - 1) % cell['keyspace']
+    return rng.integers(0, cell['keyspace'], count)
+
+
+'''
+memcached_runs():
+split a batch into consecutive runs of the same operation, in order, for get_many / set_many
+a set run is also cut when a key repeats, since set_many takes a dict and would drop the earlier write
+returns a list of (operation, keys)
+'''
+def memcached_runs(batch):
+    runs = []
+    for operation, key in batch:
+        if runs and runs[-1][0] == operation and not (operation == 'set' and key in runs[-1][1]):
+            runs[-1][1].append(key)
+        else:
+            runs.append((operation, [key]))
+    return runs
+
+
+'''
+execute_batch():
+send one batch of (operation, key) pairs, as a non transactional pipeline for Redis and as get_many / set_many runs for memcached,
+every operation of the batch is sent, in order
+'''
+def execute_batch(backend, client, batch, value):
+    if backend == 'redis':
+        if len(batch) == 1:
+            operation, key = batch[0]
+            if operation == 'get':
+                client.get(key)
+            else:
+                client.set(key, value)
+            return
+        pipe = client.pipeline(transaction = False)
+        for operation, key in batch:
+            if operation == 'get':
+                pipe.get(key)
+            else:
+                pipe.set(key, value)
+        pipe.execute()
+    else:
+        for operation, keys in memcached_runs(batch):
+            if operation == 'get':
+                if len(keys) == 1:
+                    client.get(keys[0])
+                else:
+                    client.get_many(keys)
+            elif len(keys) == 1:
+                client.set(keys[0], value, noreply = False)
+            else:
+                client.set_many({key: value for key in keys}, noreply = False)
+
+
+'''
+run_workload():
+run the operations of the cell over concurrency clients (one thread each, started together)
+returns the wall time of the run and the latency in seconds of every batch
+'''
+def run_workload(cell, clients, seed):
+    import numpy as np
+    value = b'x' * cell['value_size']
+    operations = list(cell['op_mix'])
+    weights = np.array([cell['op_mix'][operation] for operation in operations], dtype = float)
+    per_client = cell['operations'] // len(clients)
+    barrier = threading.Barrier(len(clients))
+    spans = []
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(index, client):
+        rng = np.random.default_rng(seed + index)
+        ops = rng.choice(operations, size = per_client, p = weights/weights.sum())
+        keys = draw_keys(rng, cell, per_client)
+        work = [(str(op), str(key)) for op, key in zip(ops, keys)]
+        batches = [work[x:x + cell['batch']] for x in range(0, len(work), cell['batch'])]
+        own = []
+        try:
+            barrier.wait()
+        except threading.BrokenBarrierError:
+            return
+        start = time.perf_counter()
+        try:
+            for batch in batches:
+                start_batch = time.perf_counter()
+                execute_batch(cell['backend'], client, batch, value)
+                own.append(time.perf_counter() - start_batch)
+        finally:
+            end = time.perf_counter()
+            with lock:
+                spans.append((start, end))
+                latencies.extend(own)
+
+    errors = []
+    def guarded(index, client):
+        try:
+            worker(index, client)
+        except Exception as e:
+            barrier.abort()
+            errors.append(e)
+
+    threads = [threading.Thread(target = guarded, args = (i, c)) for i, c in enumerate(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if errors:
+        raise errors[0]
+    elapsed = max(end for start, end in spans) - min(start for start, end in spans)
+    return elapsed, latencies
+
+
+'''
+run_cell():
+worker process entry point, runs one cell against its own server instance and returns the result record
+'''
+def run_cell(cell, servers, memcached_memory_mb, memcached_user):
+    import numpy as np
+    identifier = cell_id(cell)
+    result = {'id': identifier, 'cell': cell}
+    directory = tempfile.mkdtemp(prefix = 'scenario-' + identifier + '-')
+    process = None
+    try:
+        process, path = start_server(cell['backend'], directory, servers, memcached_memory_mb, memcached_user)
+        clients = [connect(cell['backend'], path) for x in range(cell['concurrency'])]
+        load_keyspace(cell['backend'], clients[0], cell['keyspace'], b'x' * cell['value_size'])
+        elapsed, latencies = run_workload(cell, clients, int(identifier, 16) % (2**32))
+        latencies = np.array(latencies)
+        result.update({
+            'elapsed': elapsed,
+            'throughput': (cell['operations'] // cell['concurrency']) * cell['concurrency'] / elapsed,
+            'batch_latency_mean': float(latencies.mean()),
+            'batch_latency_p50': float(np.percentile(latencies, 50)),
+            'batch_latency_p99': float(np.percentile(latencies, 99)),
+        })
+    except Exception as e:
+        result['error'] = '{}: {}'.format(type(e).__name__, e)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        shutil.rmtree(directory, ignore_errors = True)
+    return result
+
+
+'''
+end_partial_line():
+end the output file with a newline if an interrupted run left a partial last line,
+so the next appended result starts on its own line instead of being merged into the partial one
+'''
+def end_partial_line(output_path):
+    if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+        return
+    with open(output_path, 'rb+') as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b'\n':
+            f.write(b'\n')
+
+
+'''
+pending_cells():
+expand the spec and return (all cells, cells without a successful result in output_path)
+'''
+def pending_cells(spec, output_path):
+    cells = expand_cells(spec)
+    done = completed_cells(output_path)
+    return cells, [cell for cell in cells if cell_id(cell) not in done]
+
+
+'''
+default_workers():
+half the CPUs, each cell runs its own server and concurrency client threads so one cell per CPU would oversubscribe them
+'''
+def default_workers():
+    return max(1, (os.cpu_count() or 1)//2)
+
+
+'''
+run_sweep():
+run every cell of the spec that is not in output_path yet, workers cells at a time, appending each result as it finishes
+each result records workers, since cells running side by side compete for the CPUs and skew each other's latencies
+returns the list of new results
+'''
+def run_sweep(spec, output_path, workers = None):
+    cells, pending = pending_cells(spec, output_path)
+    print("{}: {} cells, {} already completed, {} to run".format(spec.get('name', 'scenario'), len(cells), len(cells) - len(pending), len(pending)))
+    servers = dict(SERVERS, **spec.get('servers', {}))
+    memcached_memory_mb = spec.get('memcached_memory_mb', 1024)
+    memcached_user = spec.get('memcached_user')
+    workers = workers or spec.get('workers') or default_workers()
+
+    end_partial_line(output_path)
+    results = []
+    with open(output_path, 'a') as output, concurrent.futures.ProcessPoolExecutor(max_workers = workers) as executor:
+        futures = [executor.submit(run_cell, cell, servers, memcached_memory_mb, memcached_user) for cell in pending]
+        for future in concurrent.futures.as_completed(futures):
+            result = future.result()
+            result['workers'] = workers
+            output.write(json.dumps(result) + '\n')
+            output.flush()
+            results.append(result)
+            cell = result['cell']
+            if 'error' in result:
+                status = "failed: " + result['error']
+            else:
+                status = "{:.0f} ops/s, p99 batch latency {:.1f} microseconds".format(result['throughput'], result['batch_latency_p99']*1e6)
+            print("[{}/{}] {} {} {} value {} batch {} concurrency {}: {}".format(len(results), len(pending), cell['backend'], cell['op_mix'], cell['key_distribution'], cell['value_size'], cell['batch'], cell['concurrency'], status))
+    return results
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Run a Redis / memcached benchmark scenario sweep")
+    parser.add_argument('spec', help = "scenario spec file (.toml, .json, .yaml)")
+    parser.add_argument('--output', help = "JSON lines results file, completed cells in it are skipped (default: <spec>.results.jsonl)")
+    parser.add_argument('--workers', type = int, help = "number of cells run in parallel (default: spec workers, or half the CPU count)")
+    args = parser.parse_args(argv)
+    output_path = args.output or os.path.splitext(args.spec)[0] + '.results.jsonl'
+    results = run_sweep(load_spec(args.spec), output_path, args.workers)
+    return 1 if any('error' in result for result in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
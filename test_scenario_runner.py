@@ -0,0 +1,163 @@
+import json
+import pytest
+import scenario_runner as sr
+
+SPEC = {
+    'name': 'test',
+    'operations': 1000,
+    'keyspace': 100,
+    'matrix': {
+        'backend': ['redis', 'memcached'],
+        'op_mix': [{'get': 0.9, 'set': 0.1}],
+        'key_distribution': ['uniform', 'zipf'],
+        'value_size': [16],
+        'batch': [1, 8],
+        'concurrency': [2],
+    },
+}
+
+TOML_SPEC = '''
+name = "test"
+operations = 1000
+keyspace = 100
+[matrix]
+backend = ["redis", "memcached"]
+op_mix = [{ get = 0.9, set = 0.1 }]
+key_distribution = ["uniform", "zipf"]
+value_size = [16]
+batch = [1, 8]
+concurrency = [2]
+'''
+
+YAML_SPEC = '''
+name: test
+operations: 1000
+keyspace: 100
+matrix:
+  backend: [redis, memcached]
+  op_mix: [{get: 0.9, set: 0.1}]
+  key_distribution: [uniform, zipf]
+  value_size: [16]
+  batch: [1, 8]
+  concurrency: [2]
+'''
+
+
+def with_matrix(**axes):
+    return dict(SPEC, matrix = dict(SPEC['matrix'], **axes))
+
+
+def write_results(path, rows):
+    with open(path, 'w') as f:
+        for row in rows:
+            f.write(json.dumps(row) + '\n')
+
+
+def test_spec_formats_give_the_same_cells(tmp_path):
+    pytest.importorskip('yaml')
+    (tmp_path / 'spec.json').write_text(json.dumps(SPEC))
+    (tmp_path / 'spec.toml').write_text(TOML_SPEC)
+    (tmp_path / 'spec.yaml').write_text(YAML_SPEC)
+    expanded = [sr.expand_cells(sr.load_spec(str(tmp_path / name))) for name in ('spec.json', 'spec.toml', 'spec.yaml')]
+    assert len(expanded[0]) == 8
+    assert expanded[0] == expanded[1] == expanded[2]
+    ids = [[sr.cell_id(cell) for cell in cells] for cells in expanded]
+    assert ids[0] == ids[1] == ids[2]
+    assert len(set(ids[0])) == 8
+
+
+def test_unsupported_spec_format(tmp_path):
+    (tmp_path / 'spec.ini').write_text('')
+    with pytest.raises(Exception, match = 'Unsupported'):
+        sr.load_spec(str(tmp_path / 'spec.ini'))
+
+
+def test_missing_axes_use_defaults():
+    cells = sr.expand_cells({'matrix': {'backend': ['redis']}})
+    assert len(cells) == 1
+    assert cells[0]['op_mix'] == sr.DEFAULTS['op_mix'][0]
+    assert cells[0]['operations'] == 10000
+
+
+@pytest.mark.parametrize('spec, message', [
+    (dict(SPEC, matrix = {'backends': ['redis']}), 'Unknown matrix axes'),
+    (with_matrix(backend = ['mongodb']), 'Unknown backend'),
+    (with_matrix(key_distribution = ['gaussian']), 'Unknown key distribution'),
+    (with_matrix(op_mix = [{'get': 1, 'delete': 1}]), 'op_mix'),
+    (with_matrix(op_mix = [{'get': 2, 'set': -1}]), 'op_mix'),
+    (with_matrix(op_mix = [{'get': 0, 'set': 0}]), 'op_mix'),
+    (with_matrix(batch = [0]), 'batch'),
+    (with_matrix(value_size = [-16]), 'value_size'),
+    (with_matrix(concurrency = [2000]), 'operations'),
+    (dict(SPEC, zipf_exponent = 1), 'zipf_exponent'),
+    (dict(SPEC, zipf_exponent = '1.2'), 'zipf_exponent'),
+    (dict(SPEC, keyspace = 1e5), 'keyspace'),
+    (dict(SPEC, keyspace = 0), 'keyspace'),
+    (dict(SPEC, operations = 100000.0), 'operations'),
+    (dict(SPEC, operations = '1000'), 'operations'),
+    (with_matrix(batch = [True]), 'batch'),
+    (with_matrix(value_size = [16.0]), 'value_size'),
+    (with_matrix(op_mix = [{'get': '0.9', 'set': 0.1}]), 'op_mix'),
+    (with_matrix(op_mix = [{'get': None}]), 'op_mix'),
+])
+def test_invalid_specs_raise(spec, message):
+    with pytest.raises(Exception, match = message):
+        sr.expand_cells(spec)
+
+
+def test_cell_id_ignores_key_order():
+    cell = sr.expand_cells(SPEC)[0]
+    reordered = dict(reversed(list(cell.items())))
+    assert sr.cell_id(reordered) == sr.cell_id(cell)
+
+
+def test_completed_cells_skips_errors_and_truncated_lines(tmp_path):
+    output = tmp_path / 'results.jsonl'
+    assert sr.completed_cells(str(output)) == set()
+    write_results(output, [
+        {'id': 'a', 'throughput': 1.0},
+        {'id': 'b', 'error': 'Exception: Could not start memcached'},
+        {'id': 'c', 'throughput': 2.0},
+    ])
+    with open(output, 'a') as f:
+        f.write('{"id": "d", "throughp')
+    assert sr.completed_cells(str(output)) == {'a', 'c'}
+    # a resumed run appends its next result after the partial line
+    sr.end_partial_line(str(output))
+    with open(output, 'a') as f:
+        f.write(json.dumps({'id': 'e', 'throughput': 3.0}) + '\n')
+    assert sr.completed_cells(str(output)) == {'a', 'c', 'e'}
+    sr.end_partial_line(str(output))
+    assert output.read_text().endswith('3.0}\n')
+
+
+def test_end_partial_line_leaves_complete_files_alone(tmp_path):
+    output = tmp_path / 'results.jsonl'
+    sr.end_partial_line(str(output))
+    assert not output.exists()
+    output.write_text('')
+    sr.end_partial_line(str(output))
+    assert output.read_text() == ''
+    write_results(output, [{'id': 'a'}])
+    sr.end_partial_line(str(output))
+    assert output.read_text() == '{"id": "a"}\n'
+
+
+def test_rerun_only_runs_pending_cells(tmp_path):
+    output = tmp_path / 'results.jsonl'
+    cells, pending = sr.pending_cells(SPEC, str(output))
+    assert pending == cells
+    write_results(output, [
+        {'id': sr.cell_id(cells[0]), 'cell': cells[0], 'throughput': 1.0},
+        {'id': sr.cell_id(cells[1]), 'cell': cells[1], 'error': 'Exception: failed'},
+        {'id': sr.cell_id(cells[2]), 'cell': cells[2], 'throughput': 1.0},
+    ])
+    cells, pending = sr.pending_cells(SPEC, str(output))
+    assert pending == [cells[1]] + cells[3:]
+
+
+def test_memcached_runs_keep_order_and_repeated_writes():
+    batch = [('get', '1'), ('get', '2'), ('set', '1'), ('set', '3'), ('set', '1'), ('get', '1'), ('set', '2')]
+    runs = sr.memcached_runs(batch)
+    assert runs == [('get', ['1', '2']), ('set', ['1', '3']), ('set', ['1']), ('get', ['1']), ('set', ['2'])]
+    assert sum(len(keys) for operation, keys in runs) == len(batch)
@@ -0,0 +1,60 @@
+import socket
+import pytest
+
+rb = pytest.importorskip('redis_benchmarking')
+mb = pytest.importorskip('memcached_benchmarking')
+
+
+def test_tcp_socket_options():
+    assert rb.socket_options() == [(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)]
+    assert rb.socket_options(tcp_nodelay = False) == [(socket.IPPROTO_TCP, socket.TCP_NODELAY, 0)]
+    assert rb.socket_options(send_buffer = 4096, recv_buffer = 8192) == [
+        (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+        (socket.SOL_SOCKET, socket.SO_SNDBUF, 4096),
+        (socket.SOL_SOCKET, socket.SO_RCVBUF, 8192),
+    ]
+
+
+def test_unix_socket_options_skip_tcp_nodelay():
+    assert rb.socket_options(unix_socket = True) == []
+    assert rb.socket_options(recv_buffer = 8192, unix_socket = True) == [(socket.SOL_SOCKET, socket.SO_RCVBUF, 8192)]
+
+
+def test_buffered_socket_module_sets_buffers():
+    module = mb.BufferedSocketModule(send_buffer = 65536, recv_buffer = 65536)
+    sock = module.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        # Linux reports double the requested size
+        assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF) >= 65536
+        assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF) >= 65536
+    finally:
+        sock.close()
+
+
+def test_buffered_socket_module_sets_small_buffers():
+    module = mb.BufferedSocketModule(send_buffer = 4096, recv_buffer = 4096)
+    sock = module.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF) <= 2*4096
+        assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF) <= 2*4096
+    finally:
+        sock.close()
+
+
+def test_buffered_socket_module_without_buffers_keeps_defaults():
+    module = mb.BufferedSocketModule()
+    default = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock = module.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF) == default.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+    finally:
+        sock.close()
+        default.close()
+
+
+def test_buffered_socket_module_forwards_socket_attributes():
+    module = mb.BufferedSocketModule(send_buffer = 4096)
+    assert module.AF_UNIX == socket.AF_UNIX
+    assert module.IPPROTO_TCP == socket.IPPROTO_TCP
+    assert module.TCP_NODELAY == socket.TCP_NODELAY
+    assert module.getaddrinfo is socket.getaddrinfo